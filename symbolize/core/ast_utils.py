@@ -4,6 +4,8 @@ Provides functionality to manipulate and evaluate Python AST nodes.
 ---------
 toast(s)
   Converts various types of input into an AST node.
+toast_copy(s)
+  Like toast, but returns a node that is safe to attach values to.
 build_env(node, env=None)
   Builds an environment dictionary from AST nodes.
 evast(node, env=None)
@@ -15,30 +17,71 @@ print_env(env)
 """
 
 import ast
+import copy
+from functools import lru_cache
 from itertools import count
 
+# Interned parses of identifier and constant strings, shared by every toast
+# of the same string. Treat them as read-only; use toast_copy before
+# attaching values. Larger expressions are parsed afresh each time, which
+# is cheaper than deep-copying them
+_toast_cache: dict[str, ast.expr] = {}
+
+def _interned(s):
+  """Return the parse of the source string s, interned if it is a leaf."""
+  node = _toast_cache.get(s)
+  if node is None:
+    node = ast.parse(s, mode='eval').body
+    if isinstance(node, (ast.Name, ast.Constant)):
+      _toast_cache[s] = node
+  return node
+
 def toast(s, _counter=count()):
   """Convert various types of input into an AST node."""
+  # Exact-type fast paths for the common inputs; subclasses go to the match
+  t = type(s)
+  if t is str:              return _interned(s)
+  if t is int:              return ast.Constant(value=s)
   match s:
     case ast.AST():         return s
     case object(ast=node):  return node
-    case str():             return ast.parse(s, mode='eval').body
+    case str():             return _interned(s)
     case int():             return ast.Constant(value=s)
     case _:                 #return ast.parse(repr(s), mode='eval').body
       return ast.Name(id=f'_{next(_counter)}', ctx=ast.Load(), _value=s)
 
+def toast_copy(s):
+  """Convert input into an AST node that is not shared with the toast cache."""
+  node = toast(s)
+  # Only leaf parses are interned, and a leaf has no child to share
+  if isinstance(s, str) and isinstance(node, (ast.Name, ast.Constant)):
+    node = copy.copy(node)
+  return node
+
+
+_MISSING = object()
 
 def build_env(node, env=None):
   """Build an environment dictionary from _value attributes of AST Names."""
   if env is None:
     env = {}
-  for n in ast.walk(node):
-    match n:
-      case ast.Name(id=name, _value=value):
-        env[name] = value
+  stack = [node]
+  while stack:
+    n = stack.pop()
+    value = getattr(n, '_value', _MISSING)
+    if value is not _MISSING and isinstance(n, ast.Name):
+      env[n.id] = value
+    # Names inside a Lambda never see env (see asteval), so don't descend
+    if not isinstance(n, ast.Lambda):
+      stack.extend(ast.iter_child_nodes(n))
   return env
 
 
+@lru_cache(maxsize=4096)
+def _compile_cached(src):
+  """Compile expression source to a code object, reusing earlier compiles."""
+  return compile(src, filename='', mode='eval')
+
 # There is interesting (ha!) behavior when evaluating a
 # Node storing a Lambda. Even if ast for a Name inside the Lambda
 # has a _value, that value is not used (locals are ignored when eval'ing
@@ -49,27 +92,35 @@ def asteval(node, env=None):
     env = {}
   # Toast node
   node = toast(node)
-  if not isinstance(node, ast.Expression):
-    node = ast.Expression(body=node)
-  ast.fix_missing_locations(node)
+  if isinstance(node, ast.Expression):
+    node = node.body
 
   # Grab values from ast nodes in node
   build_env(node, env)
 
   # Eval
-  code = compile(node, filename='', mode='eval')
+  # Structurally identical expressions unparse to the same source, so they
+  # share one code object; values come in through env, not the code. Since
+  # the source is what gets compiled, nodes never need line numbers
+  code = _compile_cached(unparse(node))
   globs = globals()
   # If we are in a Jupyter notebook, add the user namespace to globals
   try:
     from IPython import get_ipython
     globs |= get_ipython().user_ns
-  except ImportError:
+  except (ImportError, AttributeError): # no IPython, or not running in it
     pass
   return eval(code, None, env)
 
 def unparse(node):
   """Convert (something convertible to) an AST node back to source code."""
-  return ast.unparse(toast(node))
+  node = toast(node)
+  # Memoized on the node: Node equality, hashing, repr and diagrams all
+  # unparse the same subtrees over and over
+  src = getattr(node, '_unparsed', None)
+  if src is None:
+    src = node._unparsed = ast.unparse(node)
+  return src
 
 def print_env(env):
   """Print the environment dictionary with AST nodes."""
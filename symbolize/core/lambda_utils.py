@@ -4,24 +4,50 @@ Provides functionality to create and manipulate Python lambda functions as AST n
 """
 
 import ast
-from inspect import signature, getclosurevars
-from .ast_utils import toast
+from functools import lru_cache
+from inspect import CO_VARARGS, CO_VARKEYWORDS
+from .ast_utils import toast, asteval
 from .node import Node
 
+# Lambdas with fewer operations than this lose more to numba's dispatch
+# overhead than they gain from compilation
+MIN_JIT_OPS = 10
+_JIT_OPS = (ast.BinOp, ast.UnaryOp, ast.BoolOp, ast.Compare, ast.Call, ast.IfExp)
+_INT64_MIN, _INT64_MAX = -2**63, 2**63 - 1
+
 def star_union(it):
   """Return the union of sets from an iterable of sets."""
-  return set().union(*it)
+  # Most free_vars inputs are empty or singletons: reuse a lone non-empty
+  # set as-is and only start an accumulator once a second one shows up
+  first, acc = None, None
+  for s in it:
+    if not s:
+      continue
+    if first is None:
+      first = s
+    else:
+      if acc is None:
+        acc = set(first)
+      acc.update(s)
+  if acc is not None:
+    return frozenset(acc)
+  return frozenset() if first is None else frozenset(first)
 
 def free_vars(node):
-  """Return the set of free variables in an AST node."""
+  """Return the (frozen) set of free variables in an AST node."""
   node = toast(node)
+  # Cached on the node so each subtree is walked only once
+  if (fv := getattr(node, '_fv', None)) is not None:
+    return fv
   match node:
     case ast.Name(id=name, ctx=ast.Load()):
-      return {name}
+      fv = frozenset((name,))
     case ast.Lambda(args=args, body=body):
-      return free_vars(body) - {a.arg for a in args.args}
+      fv = free_vars(body) - {a.arg for a in args.args}
     case _:
-      return star_union(free_vars(c) for c in ast.iter_child_nodes(node))
+      fv = star_union(free_vars(c) for c in ast.iter_child_nodes(node))
+  node._fv = fv
+  return fv
 
 def fresh(base, taken):
   """Generate a fresh variable name based on a base name, avoiding names in taken."""
@@ -33,12 +59,28 @@ def fresh(base, taken):
     candidate = f"{base}{i}"
   return candidate
 
+@lru_cache(maxsize=256)
+def _lambda_meta(code):
+  """Return the parameter names and referenced global names of a code object.
+
+  Stands in for inspect.signature and inspect.getclosurevars, whose
+  reflection is slow and depends only on the code, not the closure values.
+  """
+  n, k, names = code.co_argcount, code.co_kwonlyargcount, code.co_varnames
+  star = (names[n + k],) if code.co_flags & CO_VARARGS else ()
+  i = n + k + len(star)
+  starstar = (names[i],) if code.co_flags & CO_VARKEYWORDS else ()
+  params = names[:n] + star + names[n:n + k] + starstar
+  return params, code.co_names
+
 def make_lambda(lamb):
   """Convert a lambda function to an AST Lambda node."""
-  args = list(signature(lamb).parameters.keys())
-  nonlocals, globs, _, _ = getclosurevars(lamb)
-  free_in_closure = star_union(free_vars(v) for v in nonlocals.values())
-  taken = free_in_closure | set(globs.keys()) | set(args)
+  params, names = _lambda_meta(lamb.__code__)
+  args = list(params)
+  nonlocals = [cell.cell_contents for cell in lamb.__closure__ or ()]
+  globs = {name for name in names if name in lamb.__globals__}
+  free_in_closure = star_union(free_vars(v) for v in nonlocals)
+  taken = free_in_closure | globs | set(args)
   for i, arg in enumerate(args):
     if arg in free_in_closure:
       args[i] = fresh(arg, taken)
@@ -51,4 +93,50 @@ def make_lambda(lamb):
                          args=[ast.arg(arg=arg) for arg in args],
                          kwonlyargs=[], kw_defaults=[], defaults=[]),
       body=body.ast
-  )
\ No newline at end of file
+  )
+
+def jit_lambda(lam):
+  """Return a numba-compiled function for a Lambda AST node, or None.
+
+  Only closed lambdas (no free variables) with at least MIN_JIT_OPS
+  operations are compiled; the result is cached on the node.
+  """
+  if hasattr(lam, '_jit'):
+    return lam._jit
+  lam._jit = None
+  if (not free_vars(lam)
+      and sum(isinstance(n, _JIT_OPS) for n in ast.walk(lam.body)) >= MIN_JIT_OPS):
+    try:
+      import numba
+      lam._jit = numba.njit(asteval(lam))
+    except ImportError:
+      pass
+  return lam._jit
+
+def _jittable_arg(arg):
+  """Check that numba sees arg as the same value Python does."""
+  if type(arg) is float:
+    return True
+  return type(arg) is int and _INT64_MIN <= arg <= _INT64_MAX
+
+def jit_call(call):
+  """Evaluate a Call of a Lambda AST node on int/float args through numba.
+
+  Returns None if the call is not eligible, leaving it to asteval. Note
+  that numba does int arithmetic in int64, which wraps where Python ints
+  would grow, so a result that overflows differs from asteval's.
+  """
+  # Check the lambda first: if it won't be jitted, asteval evaluates the
+  # whole call anyway and the args shouldn't be evaluated twice
+  jitted = jit_lambda(call.func)
+  if jitted is None:
+    return None
+  args = [asteval(arg) for arg in call.args]
+  if not all(_jittable_arg(arg) for arg in args):
+    return None
+  from numba.core.errors import NumbaError
+  try:
+    return jitted(*args)
+  except NumbaError: # numba can't compile it; don't try again
+    call.func._jit = None
+    return None
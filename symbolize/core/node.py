@@ -4,8 +4,7 @@ Defines the Node class for symbolic representation of AST nodes.
 """
 import ast
 from types import FunctionType
-from .tree import draw_tree
-from .ast_utils import toast, asteval, unparse
+from .ast_utils import toast_copy, asteval, unparse
 
 def is_concrete(node):
   """Check if the node is a concrete value (not a Node or lambda)."""
@@ -17,6 +16,13 @@ def is_concrete(node):
 class Node():
   """Node class for symbolic representation of python values"""
 
+  # Run on each child AST the concreteness walk descends into, standing in
+  # for the side effects of wrapping it as type(self)(child)
+  _adopt_child = None
+
+  # Opt-in: apply numeric lambdas through numba (see lambda_utils.jit_call)
+  USE_NUMBA = False
+
   def __init__(self, node, value=None):
     match node:
       case Node(ast=_ast):
@@ -25,7 +31,7 @@ class Node():
         from .lambda_utils import make_lambda
         self.ast = make_lambda(node)
       case _:
-        self.ast = toast(node)
+        self.ast = toast_copy(node)
     if value is not None: # ast may already have a value, don't clobber
       self.value = value
 
@@ -37,6 +43,9 @@ class Node():
   def __eq__(self, other):
     return isinstance(other, Node) and unparse(self) == unparse(other)
 
+  def __hash__(self):
+    return hash(unparse(self))
+
   def __repr__(self) -> str:
     if isinstance(self.ast, ast.Lambda): 
       return unparse(self)
@@ -47,17 +56,7 @@ class Node():
   def are_calls_concrete(self):
     """Check if all Calls in the AST are concrete (no symbolic args)."""
     #TODO: maybe add a type hint that allows symbolic args
-    match self.ast:
-      case ast.Lambda():
-        return True
-      case ast.Call(func=func, args=args):
-        func = asteval(func)
-        if is_concrete(func):
-          args = [asteval(arg) for arg in args]
-          if any(isinstance(arg, Node) for arg in args):
-            return False
-
-    return all(child.are_calls_concrete() for child in self.children())
+    return _are_calls_concrete(self.ast, self._adopt_child)
 
   def eval(self):
     """Evaluate the AST node, returning its value."""
@@ -65,6 +64,12 @@ class Node():
       if not self.are_calls_concrete(): 
         return None
 
+      match self.ast:
+        case ast.Call(func=ast.Lambda()) if self.USE_NUMBA:
+          from .lambda_utils import jit_call
+          if (val := jit_call(self.ast)) is not None:
+            return val
+
       val = asteval(self)
       match val:
         case FunctionType(__name__ = '<lambda>'): return type(self)(val)
@@ -73,11 +78,14 @@ class Node():
       print(e)
       return None
 
+  def _child_asts(self):
+    """ Return the raw ast expression children, without Node wrappers. """
+    return _expr_children(self.ast)
+
   def children(self):
-    """ Return the ast node children as Node instances. """
+    """ Lazily yield the ast node children as Node instances. """
     # Q: should the children be Nodes or Node subclasses?
-    return [type(self)(c) for c in ast.iter_child_nodes(self.ast)
-                    if isinstance(c, ast.expr)                ]
+    return (type(self)(c) for c in self._child_asts())
 
   def label(self):
     """ Return a graphviz label for the Node"""
@@ -88,16 +96,17 @@ class Node():
     return [self.label(), *(c.as_list() for c in self.children())]
 
   def _repr_svg_(self):
+    from .tree import draw_tree
     tree = draw_tree(self.as_list())
     return tree.pipe(format='svg').decode('utf-8')
 
   def __call__(self, *args):
-    args = [toast(arg) for arg in args]
+    args = [toast_copy(arg) for arg in args]
     node = ast.Call(func=self.ast, args=args, keywords=[])
     return type(self)(node)
 
   def __and__(self, other):
-    node = ast.BinOp(op=ast.BitAnd(), left=self.ast, right=toast(other))
+    node = ast.BinOp(op=ast.BitAnd(), left=self.ast, right=toast_copy(other))
     return type(self)(node)
 
   def __iadd__(self, other):      self.value += other; return self
@@ -112,3 +121,53 @@ class Node():
     match self.ast:
       case ast.Call(func=ast.Name(_value=s), args=args):
         s.add(tuple(asteval(arg) for arg in args))
+
+
+def _expr_children(node):
+  """Yield the expression children of a raw AST node."""
+  return (c for c in ast.iter_child_nodes(node) if isinstance(c, ast.expr))
+
+def _call_is_concrete(call):
+  """Check a single Call: a concrete function must not get symbolic args."""
+  func = asteval(call.func)
+  if is_concrete(func):
+    args = [asteval(arg) for arg in call.args]
+    if any(isinstance(arg, Node) for arg in args):
+      return False
+  return True
+
+def _are_calls_concrete(root, adopt=None):
+  """Check all Calls under a raw AST node, skipping Lambda bodies.
+
+  Each Call's func is evaluated at most once per walk, even where subtrees
+  are shared. Verdicts are not kept between walks: they depend on values
+  and notebook globals that can be rebound at any time. If given, adopt is
+  called on the children of each node that passed its own check, before
+  the walk descends into them.
+  """
+  stack, seen = [root], set()
+  while stack:
+    n = stack.pop()
+    if id(n) in seen or isinstance(n, ast.Lambda):
+      continue
+    seen.add(id(n))
+    if isinstance(n, ast.Call) and not _call_is_concrete(n):
+      return False
+    children = [*_expr_children(n)]
+    if adopt is not None:
+      for c in children:
+        adopt(c)
+    stack.extend(reversed(children))
+  return True
+
+
+#Tests
+if __name__ == "__main__":
+  from symbolize.core import ast_utils
+  # Rebinding a global the expression reads must be seen on the next check
+  ast_utils.y = 5
+  e = Node('abs')(Node('y'))
+  assert repr(e) == 'abs(y) = 5'
+  ast_utils.y = Node('q')
+  assert repr(e) == 'abs(y)'
+
@@ -7,7 +7,6 @@ draw_tree(tree)
 """
 
 from itertools import count
-from graphviz import Digraph
 
 def draw_tree(tree):
   """
@@ -27,6 +26,8 @@ def draw_tree(tree):
         • straight branches
         • every parent-to-children set originating at one point
   """
+  # Imported here so importing symbolize doesn't pull in graphviz
+  from graphviz import Digraph
   dot = Digraph(
     engine='dot',
     graph_attr={'rankdir':'TB', 'splines':'false'},
@@ -35,27 +36,30 @@ def draw_tree(tree):
   )
 
   uid = count()               # unique node IDs
+  nodes, edges = [], []
 
-  def rec(subtree, parent_id=None):
+  # Pre-order walk with an explicit stack; kids are pushed in reverse so
+  # they come off (and get numbered) left to right
+  stack = [(tree, None)]
+  while stack:
+    subtree, parent_id = stack.pop()
     match subtree:
-      case [label, *kids]:    # non-leaf iterable
+      case [label, *kids]:    # any non-empty iterable; bare kids are leaves
         node_id = f"n{next(uid)}"
-        dot.node(node_id, str(label))
+        nodes.append((node_id, str(label)))
         if parent_id is not None:
-          dot.edge(f'{parent_id}:s', f'{node_id}:n')
+          edges.append((f'{parent_id}:s', f'{node_id}:n'))
 
-        for kid in kids:
+        for kid in reversed(kids):
           # A kid is a subtree iff it's a tuple or list
           is_subtree = isinstance(kid, (tuple,list))
-          rec(kid if is_subtree else (kid,), node_id)
-
-      case [leaf]:           # singleton tuple → actual leaf
-        leaf_id = f"n{next(uid)}"
-        dot.node(leaf_id, str(leaf))
-        dot.edge(f'{parent_id}:s', f'{leaf_id}:n')
+          stack.append((kid if is_subtree else (kid,), node_id))
 
       case _:                 # safety net
         raise TypeError("Each subtree must be an iterable with at least one element")
 
-  rec(tree)                   # kick off the recursion
+  for node_id, label in nodes:
+    dot.node(node_id, label)
+  for tail, head in edges:
+    dot.edge(tail, head)
   return dot
@@ -2,9 +2,11 @@
 
 import itertools
 import html
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import lru_cache
 from dataclasses import dataclass, field
-from typing import Dict, List, Optional
-from graphviz import Source
+from typing import Dict, Iterator, List, Optional
 
 # ---------- constants -------------------------------------------------
 class Colors:
@@ -23,25 +25,60 @@ class Colors:
   LAM_BORDER = "#A93226"
 
 # ---------- id factory ------------------------------------------------
-_id_counter = itertools.count()
+# Outside fresh_ids() every diagram draws from one session-wide counter, so
+# separately built pieces can still be composed without ID clashes
+_id_counter: ContextVar[Iterator[int]] = ContextVar('_id_counter',
+                                                   default=itertools.count())
 
 def _new_id(prefix: str = "n") -> str:
-  return f"{prefix}{next(_id_counter)}"
+  return f"{prefix}{next(_id_counter.get())}"
+
+@contextmanager
+def fresh_ids():
+  """Number node IDs from zero for diagrams built inside the block.
+
+  Wrap a whole top-level diagram build in this, so IDs stay short in long
+  sessions; pieces built in separate blocks must not be combined.
+  """
+  token = _id_counter.set(itertools.count())
+  try:
+    yield
+  finally:
+    _id_counter.reset(token)
 
 # ---------- HTML badge helpers ---------------------------------------
+@lru_cache(maxsize=1024)
+def _escape_cached(s: str) -> str:
+  return html.escape(s)
+
+def _esc(s: str) -> str:
+  # Identifiers (the usual labels) contain nothing html.escape would touch
+  return s if s.isidentifier() else _escape_cached(s)
+
 def _badge(sym: str, val: Optional[str], fill=Colors.BADGE_BG) -> str:
-  inner_val = f'<TR><TD BGCOLOR="{Colors.EXT_BG}">{html.escape(val)}</TD></TR>' if val else ""
+  inner_val = f'<TR><TD BGCOLOR="{Colors.EXT_BG}">{_esc(val)}</TD></TR>' if val else ""
   return (
       f'<TABLE BORDER="0" CELLBORDER="1" CELLSPACING="0">'
-      f'<TR><TD BGCOLOR="{fill}"><B>{html.escape(sym)}</B></TD></TR>{inner_val}</TABLE>')
+      f'<TR><TD BGCOLOR="{fill}"><B>{_esc(sym)}</B></TD></TR>{inner_val}</TABLE>')
 
 def _leaf_badge(name: str, ext: Optional[str]) -> str:
-  ext_row = f'<TR><TD BGCOLOR="{Colors.EXT_BG}">{html.escape(ext)}</TD></TR>' if ext else ""
+  ext_row = f'<TR><TD BGCOLOR="{Colors.EXT_BG}">{_esc(ext)}</TD></TR>' if ext else ""
   return (
       '<TABLE BORDER="0" CELLBORDER="1" CELLSPACING="0">'
-      f'<TR><TD BGCOLOR="{Colors.LEAF_BG}"><B>{html.escape(name)}</B></TD></TR>{ext_row}</TABLE>')
+      f'<TR><TD BGCOLOR="{Colors.LEAF_BG}"><B>{_esc(name)}</B></TD></TR>{ext_row}</TABLE>')
 
 # ---------- core dataclass -------------------------------------------
+_DOT_HEADER = """
+digraph {name} {{
+  rankdir=TB
+  graph [margin=0.2, ranksep=0.6, nodesep=0.1]
+  node  [fontname="Helvetica", fontsize=10]
+  edge  [fontname="Helvetica", arrowsize=0.7, color="#17202A"]
+  """
+_DOT_FOOTER = """
+}
+"""
+
 @dataclass
 class Diagram:
   """Class to generate a Graphviz diagram for a relation."""
@@ -56,18 +93,11 @@ class Diagram:
 
   def full_dot(self, name: str = "G"):
     """Generate the full Graphviz DOT representation of the diagram."""
-    return f"""
-digraph {name} {{
-  rankdir=TB
-  graph [margin=0.2, ranksep=0.6, nodesep=0.1]
-  node  [fontname="Helvetica", fontsize=10]
-  edge  [fontname="Helvetica", arrowsize=0.7, color="#17202A"]
-  {self.dot}
-}}
-"""
+    return _DOT_HEADER.format(name=name) + self.dot + _DOT_FOOTER
 
   def render(self, name: str = "G"):
     """Render the diagram as a Graphviz Source object."""
+    from graphviz import Source
     return Source(self.full_dot(name))
   
   @property
@@ -77,19 +107,17 @@ digraph {name} {{
 
 
 def _add_ports(n, root):
-  dot = ''
+  parts = []
   ports = []
-  weight = 5 * n
   last = root
   for _ in range(n):
     port = _new_id('port')
     ports.append(port)
-    dot += f'{port} [shape=point];\n'
-    dot += f'{last} -> {port} [arrowhead=none, style=invis, weight=2];\n'
+    parts.append(f'{port} [shape=point];\n')
+    parts.append(f'{last} -> {port} [arrowhead=none, style=invis, weight=2];\n')
     last = port
-    weight -= 5
-  dot += '{ rank=same; ' + f'{root} ' + ' '.join(ports) + ' }\n'
-  return dot, ports
+  parts.append('{ rank=same; ' + f'{root} ' + ' '.join(ports) + ' }\n')
+  return ''.join(parts), ports
 
 
 # ---------- leaves ----------------------------------------------------
@@ -97,7 +125,7 @@ def id(name: str) -> Diagram:
   """Create a diagram for an identifier. """
   n = _new_id()
   dot = (
-    f'{n} [label="{html.escape(name)}", shape=box, style="rounded,filled", '
+    f'{n} [label="{_esc(name)}", shape=box, style="rounded,filled", '
           f'fillcolor="{Colors.ID_BG}", color="{Colors.ID_TEXT}"]\n'
   )
   return Diagram(dot, n, n, name, [], [], None, {})
@@ -105,7 +133,7 @@ def id(name: str) -> Diagram:
 def var(name: str) -> Diagram:
   """Create a diagram for a variable."""
   n = _new_id()
-  label = f'<<I>{html.escape(name)}</I>>'
+  label = f'<<I>{_esc(name)}</I>>'
   dot = (
       f'{n} [label={label}, shape=box, style="rounded,filled,dashed", '
       f'fillcolor="#FFFFFF", color="{Colors.ID_TEXT}"]\n'
@@ -115,10 +143,8 @@ def var(name: str) -> Diagram:
 def pred(name: str, arity: int = 1, ext: Optional[str] = None) -> Diagram:
   """Create a diagram for a predicate with the given name and arity."""
   n = _new_id()
-  dot = f'{n} [shape=plain, label=<{_leaf_badge(name, ext)}>]\n'
-
   dot_ports, ports = _add_ports(arity, n)
-  dot += dot_ports
+  dot = f'{n} [shape=plain, label=<{_leaf_badge(name, ext)}>]\n' + dot_ports
 
   cid = _new_id('cluster')
   return Diagram(
@@ -141,23 +167,21 @@ def op(sym, *kids, value=None):
           else '(' + f" {sym} ".join(k.expr for k in kids) + ')'
         )
   b = _new_id()
-  body = (
-      f'{b} [shape=plain, label=<{_badge(sym,value)}>];\n'
-      + "".join(k.dot for k in kids)
-  )
+  parts = [f'{b} [shape=plain, label=<{_badge(sym,value)}>];\n']
+  parts.extend(k.dot for k in kids)
 
   for i, k in enumerate(kids):
     weight = 1 if i==0 else 0
     constraint = True
-    body += f'{b} -> {k.root} [weight={weight}, constraint={constraint}];\n'
+    parts.append(f'{b} -> {k.root} [weight={weight}, constraint={constraint}];\n')
 
 
   dot_ports, ports = _add_ports(arity, b)
-  body += dot_ports
+  parts.append(dot_ports)
 
   for kid in kids:
     for port, kid_port in zip(ports, kid.arg_ports):
-      body += f'{port} -> {kid_port} [weight=0, dir=none, style=dashed, color="{Colors.SUBTLE_EDGE}"];\n'
+      parts.append(f'{port} -> {kid_port} [weight=0, dir=none, style=dashed, color="{Colors.SUBTLE_EDGE}"];\n')
 
   cid = _new_id('cluster')
   free: Dict[str, List[str]] = {}
@@ -166,7 +190,7 @@ def op(sym, *kids, value=None):
       free.setdefault(name, []).extend(nodes)
 
   return Diagram(
-    f'subgraph {cid} {{ label="{html.escape(expr)}"; style=dotted; margin=10;\n{body}}}\n',
+    f'subgraph {cid} {{ label="{_esc(expr)}"; style=dotted; margin=10;\n{"".join(parts)}}}\n',
     b, kids[0].left_anchor, expr, ports, list(kids), cid, free
   )
 
@@ -178,21 +202,20 @@ def app(func: Diagram, *args: List[Diagram], value: Optional[str] = None) -> Dia
   badge = _new_id()
 
   # base body: () badge + function subtree + args subtrees
-  body = (
-      f'{badge} [shape=plain, label=<{_badge("()", value, Colors.APP_BADGE_BG)}>]\n' 
-      + func.dot + "".join(a.dot for a in args)
-  )
+  parts = [f'{badge} [shape=plain, label=<{_badge("()", value, Colors.APP_BADGE_BG)}>]\n',
+           func.dot]
+  parts.extend(a.dot for a in args)
 
   for p, arg in zip(func.arg_ports, args):
-    body += f'{p} -> {arg.root} [weight=1, style=dashed, arrowhead=empty];\n'
+    parts.append(f'{p} -> {arg.root} [weight=1, style=dashed, arrowhead=empty];\n')
 
-  body += f'{badge} -> {func.root} [style=invis, weight=5];\n'
+  parts.append(f'{badge} -> {func.root} [style=invis, weight=5];\n')
 
 #  for i, k in enumerate(args):
-#    body += f'{badge} -> {k.root} [style=invis, arrowhead=none, weight=0, constraint=false];\n'
+#    parts.append(f'{badge} -> {k.root} [style=invis, arrowhead=none, weight=0, constraint=false];\n')
 
   cid = _new_id('cluster_app')
-  cluster = f'subgraph {cid} {{ label="{html.escape(expr)}"; style=dashed; margin=10;\n{body}}}\n'
+  cluster = f'subgraph {cid} {{ label="{_esc(expr)}"; style=dashed; margin=10;\n{"".join(parts)}}}\n'
   free: Dict[str, List[str]] = {}
   for part in (func, *args):
     for name, nodes in part.free_vars.items():
@@ -207,26 +230,25 @@ def lam(var: str, body: Diagram, value: Optional[str] = None) -> Diagram:
   expr = f"λ{var}.{body.expr}"
   badge = _new_id()
 
-  dot = (
-      f'{badge} [label="λ{html.escape(var)}", shape=parallelogram, style="filled", '
-      f'fillcolor="{Colors.LAM_BG}", color="{Colors.LAM_BORDER}", fontname="monospace"]\n'
-      + body.dot
-  )
-
-  dot += f'{badge} -> {body.root} [style=invis, weight=0];\n'
+  parts = [
+      f'{badge} [label="λ{_esc(var)}", shape=parallelogram, style="filled", '
+      f'fillcolor="{Colors.LAM_BG}", color="{Colors.LAM_BORDER}", fontname="monospace"]\n',
+      body.dot,
+      f'{badge} -> {body.root} [style=invis, weight=0];\n',
+  ]
 
   dot_ports, ports = _add_ports(1, badge)
-  dot += dot_ports
+  parts.append(dot_ports)
 
   for target in body.free_vars.get(var, []):
-    dot += (
+    parts.append(
         f'{ports[0]} -> {target} [style=dotted, '
         f'arrowhead=odot, penwidth=0.8, weight=0, constraint=false];\n'
     )
 
   cid = _new_id('cluster_lam')
   cluster = (
-      f'subgraph {cid} {{ label="{html.escape(expr)}"; style=dashed; color="{Colors.LAM_BORDER}"; margin=10;\n{dot}}}\n'
+      f'subgraph {cid} {{ label="{_esc(expr)}"; style=dashed; color="{Colors.LAM_BORDER}"; margin=10;\n{"".join(parts)}}}\n'
   )
   free = {k: list(v) for k, v in body.free_vars.items() if k != var}
   return Diagram(cluster, badge, body.left_anchor, expr, ports, [body], cid, free)
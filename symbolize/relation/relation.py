@@ -19,12 +19,32 @@ class IdNode(Node):
         return id_diagram(repr(self))
 
   def _repr_svg_(self):
-    return self.diagram().render().pipe(format='svg').decode('utf-8')
+    from .diagram import fresh_ids
+    with fresh_ids():
+      dia = self.diagram()
+    return dia.render().pipe(format='svg').decode('utf-8')
 
 def tuplify(x):
   """Convert input to a tuple if it is not already."""
   return x if isinstance(x, tuple) else (x,)
 
+# Key marking the end of a stored tuple in a Relation's prefix trie
+_END = object()
+
+def _trie_insert(trie, t):
+  """Insert tuple t into a nested-dict prefix trie."""
+  for e in t:
+    trie = trie.setdefault(e, {})
+  trie[_END] = True
+
+def _trie_tuples(trie, prefix=()):
+  """Yield every tuple stored under a (sub)trie, prefixed with prefix."""
+  for e, child in trie.items():
+    if e is _END:
+      yield prefix
+    else:
+      yield from _trie_tuples(child, prefix + (e,))
+
 class Relation(set):
   """Relation class for logical relations."""
 
@@ -37,6 +57,34 @@ class Relation(set):
     self.arity = arity
     if self.arity is None and s:
       self.arity = len(next(iter(s)))
+    self._trie = None
+    self._projections = {}
+
+  @classmethod
+  def _from_validated(cls, tuples, arity):
+    """Build a Relation from tuples already known to be normalized."""
+    r = cls.__new__(cls)
+    set.__init__(r, tuples)
+    r.arity = arity
+    r._trie = None
+    r._projections = {}
+    return r
+
+  def _prefix_trie(self):
+    """Return a prefix trie over the tuples, built on first use."""
+    if self._trie is None:
+      self._trie = {}
+      for t in self:
+        _trie_insert(self._trie, t)
+    return self._trie
+
+  def _invalidate(self):
+    self._trie = None
+    self._projections.clear()
+
+  def __getstate__(self):
+    # Copies and pickles rebuild their own indexes rather than share ours
+    return {**self.__dict__, '_trie': None, '_projections': {}}
 
   def add(self, element):
     element = tuplify(element)
@@ -45,14 +93,54 @@ class Relation(set):
     elif len(element) != self.arity:
       raise ValueError("Arity mismatch")
     super().add(element)
+    if self._trie is not None:
+      _trie_insert(self._trie, element)
+    self._projections.clear()
+
+  # Other mutators just drop the trie; it is rebuilt on the next call
+  def remove(self, element):  self._invalidate(); super().remove(element)
+  def discard(self, element): self._invalidate(); super().discard(element)
+  def pop(self):              self._invalidate(); return super().pop()
+  def clear(self):            self._invalidate(); super().clear()
+  def update(self, *others):  self._invalidate(); super().update(*others)
+  def intersection_update(self, *others):
+    self._invalidate(); super().intersection_update(*others)
+  def difference_update(self, *others):
+    self._invalidate(); super().difference_update(*others)
+  def symmetric_difference_update(self, other):
+    self._invalidate(); super().symmetric_difference_update(other)
+  def __ior__(self, other):   self._invalidate(); return super().__ior__(other)
+  def __iand__(self, other):  self._invalidate(); return super().__iand__(other)
+  def __ixor__(self, other):  self._invalidate(); return super().__ixor__(other)
+
+  def _project(self, args):
+    """Return the suffixes of the tuples that start with args."""
+    try:
+      hash(args)
+    except TypeError: # can't index the trie; compare against every tuple
+      n = len(args)
+      return { t[n:] for t in self if t[:n] == args}
+    # Descend the trie along args instead of scanning every tuple
+    trie = self._prefix_trie()
+    for a in args:
+      trie = trie.get(a)
+      if trie is None:
+        return set()
+    return set(_trie_tuples(trie))
 
   def __call__(self, *args):
     n = len(args)
-    result = { t[n:] for t in self if t[:n] == args}
+    # Projections are memoized until the relation changes
+    try:
+      result = self._projections.get(args)
+    except TypeError: # unhashable args can't be memoized
+      result = self._project(args)
+    if result is None:
+      result = self._projections[args] = frozenset(self._project(args))
     ar = None
     if self.arity is not None:
       ar = max(self.arity - n, 0)
-    return Relation(result, ar)
+    return self._from_validated(result, ar)
 
   def __invert__(self):
     return next(iter(self))[0]
@@ -63,12 +151,17 @@ class Relation(set):
         other.arity = self.arity
       if self.arity != other.arity:
         raise ValueError("Arity mismatch for intersection")
-    return Relation(set(self) & set(other),
+    # Every element of the intersection comes from self, so it is normalized
+    return self._from_validated(set.intersection(self, other),
                     self.arity if self.arity == getattr(other, 'arity', None) else self.arity)
 
   def __or__(self, other):
-    return Relation(set(self) | set(other),
-                    self.arity if self.arity == getattr(other, 'arity', None) else self.arity)
+    arity = self.arity if self.arity == getattr(other, 'arity', None) else self.arity
+    if not isinstance(other, Relation): # may hold bare, untuplified elements
+      return Relation(set.union(self, other), arity)
+    if arity is None: # self is empty; take other's, as __init__ would infer
+      arity = other.arity
+    return self._from_validated(set.union(self, other), arity)
 
   def __iadd__(self, other):  self.add(tuplify(other)); return self
   def __isub__(self, other):  self.remove(tuplify(other)); return self
@@ -78,6 +171,10 @@ class Relation(set):
     if self == {()}:  return '{()} / True'
     return repr({e[0] if len(e) == 1 else e for e in self})
 
+# Diagram symbols for the BinOp operators RelationNode can draw
+_OP_SYMBOLS = {ast.BitAnd: '&', ast.BitOr: '|', ast.Add: '+',
+               ast.Sub: '-', ast.Mult: '*', ast.Div: '/'}
+
 class RelationNode(Node):
   """Node class for Relation, allowing set-like operations on tuples."""
 
@@ -86,6 +183,13 @@ class RelationNode(Node):
     if isinstance(self.ast, ast.Name) and self.value is None:
       self.value = Relation()
 
+  @staticmethod
+  def _adopt_child(child):
+    # What wrapping the child in a RelationNode did: bind unbound Names to
+    # empty relations
+    if isinstance(child, ast.Name) and getattr(child, '_value', None) is None:
+      RelationNode(child)
+
   def label(self):
     label = super().label()
     if '{}' in label:
@@ -97,7 +201,10 @@ class RelationNode(Node):
     return label
 
   def _repr_svg_(self):
-    return self.diagram().render().pipe(format='svg').decode('utf-8')
+    from .diagram import fresh_ids
+    with fresh_ids():
+      dia = self.diagram()
+    return dia.render().pipe(format='svg').decode('utf-8')
   
   def diagram(self):
     """Convert to a DOT representation for graph visualization."""
@@ -115,23 +222,11 @@ class RelationNode(Node):
         return app(RelationNode(func).diagram(),
                    *[IdNode(arg.id).diagram() for arg in args], value=val)
       case ast.BinOp(left=left, op=oper, right=right):
-        match oper:
-          case ast.BitAnd():
-            oper = '&'
-          case ast.BitOr():
-            oper = '|'
-          case ast.Add():
-            oper = '+'
-          case ast.Sub():
-            oper = '-'
-          case ast.Mult():
-            oper = '*'
-          case ast.Div():
-            oper = '/'
-          case _:
-            raise ValueError(f'Unsupported operator: {oper}')
+        sym = _OP_SYMBOLS.get(type(oper))
+        if sym is None:
+          raise ValueError(f'Unsupported operator: {oper}')
         val = repr(self.eval())
-        return op(oper, RelationNode(left).diagram(), RelationNode(right).diagram(), value=val)
+        return op(sym, RelationNode(left).diagram(), RelationNode(right).diagram(), value=val)
 
 
 def detectors(s): 
@@ -142,3 +237,8 @@ def ids(s):
   """Convert a string of symbols characters into a generator of Nodes."""
   return (IdNode(c, c) for c in s)
 
+
+#Tests
+if __name__ == "__main__":
+  # Names nobody bound evaluate as empty relations
+  assert repr(RelationNode('foo & bar')) == 'foo & bar = {} / False'